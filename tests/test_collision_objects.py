@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+import pytest
+import pybullet
+
+from trifinger_simulation import collision_objects
+
+
+@pytest.fixture
+def client_id():
+    client_id = pybullet.connect(pybullet.DIRECT)
+    collision_objects.reset_shape_cache(client_id)
+    yield client_id
+    pybullet.disconnect(client_id)
+
+
+def _collision_extents(obj, client_id):
+    """Get the extents of the collision box of the given object."""
+    shape_data = pybullet.getCollisionShapeData(
+        obj._object_id, -1, physicsClientId=client_id
+    )
+    return shape_data[0][3]
+
+
+def _record_rendering_calls(monkeypatch, connection_method):
+    """Fake the connection method and record changes of the rendering flag."""
+    calls = []
+
+    def get_connection_info(client_id):
+        return {"isConnected": 1, "connectionMethod": connection_method}
+
+    def configure_debug_visualizer(flag, enable, physicsClientId):
+        if flag == pybullet.COV_ENABLE_RENDERING:
+            calls.append(enable)
+
+    monkeypatch.setattr(pybullet, "getConnectionInfo", get_connection_info)
+    monkeypatch.setattr(
+        pybullet, "configureDebugVisualizer", configure_debug_visualizer
+    )
+    return calls
+
+
+def test_batch_create_direct(client_id, monkeypatch):
+    calls = _record_rendering_calls(monkeypatch, pybullet.DIRECT)
+
+    with collision_objects.batch_create(client_id):
+        collision_objects.Cube(pybullet_client_id=client_id)
+    collision_objects.Cube(pybullet_client_id=client_id)
+
+    # DIRECT clients have no visualisation, so rendering is not touched
+    assert calls == []
+
+
+def test_batch_create_gui(client_id, monkeypatch):
+    calls = _record_rendering_calls(monkeypatch, pybullet.GUI)
+
+    with collision_objects.batch_create(client_id):
+        collision_objects.Cube(pybullet_client_id=client_id)
+        collision_objects.Cube(pybullet_client_id=client_id)
+    # rendering is only paused once for all objects
+    assert calls == [0, 1]
+
+    calls.clear()
+    with collision_objects.batch_create(client_id, enable_rendering=False):
+        collision_objects.Cube(pybullet_client_id=client_id)
+    assert calls == [0]
+
+
+def test_cuboid_shapes_are_shared(client_id):
+    cube1 = collision_objects.Cube(
+        color_rgba=(1, 0, 0, 1),
+        pybullet_client_id=client_id,
+        share_shapes=True,
+    )
+    cube2 = collision_objects.Cube(
+        position=(0, 0, 0.1),
+        color_rgba=(1, 0, 0, 1),
+        pybullet_client_id=client_id,
+        share_shapes=True,
+    )
+    other_size = collision_objects.Cube(
+        half_width=0.01, pybullet_client_id=client_id, share_shapes=True
+    )
+    other_colour = collision_objects.Cube(
+        color_rgba=(0, 1, 0, 1),
+        pybullet_client_id=client_id,
+        share_shapes=True,
+    )
+
+    assert cube1._object_id != cube2._object_id
+    assert cube1.block_id == cube2.block_id
+    assert cube1.visual_shape_id == cube2.visual_shape_id
+
+    assert other_size.block_id != cube1.block_id
+    assert _collision_extents(other_size, client_id) == pytest.approx(
+        (0.02, 0.02, 0.02)
+    )
+    assert other_colour.block_id == cube1.block_id
+    assert other_colour.visual_shape_id != cube1.visual_shape_id
+
+    # equivalent specifications of the half extents should map to the same
+    # shape
+    cuboid = collision_objects.Cuboid(
+        (0, 0, 0.2),
+        (0, 0, 0, 1),
+        half_extents=[0.0325, 0.0325, 0.0325],
+        mass=0.08,
+        pybullet_client_id=client_id,
+        share_shapes=True,
+    )
+    assert cuboid.block_id == cube1.block_id
+
+
+def test_cuboid_shapes_not_shared_by_default(client_id):
+    cube1 = collision_objects.Cube(pybullet_client_id=client_id)
+    cube2 = collision_objects.Cube(pybullet_client_id=client_id)
+
+    assert cube1.block_id != cube2.block_id
+    assert not [
+        k for k in collision_objects._box_collision_cache if k[0] == client_id
+    ]
+
+
+def test_cuboid_dynamics(client_id):
+    cube = collision_objects.Cube(pybullet_client_id=client_id)
+    info = pybullet.getDynamicsInfo(
+        cube._object_id, -1, physicsClientId=client_id
+    )
+    assert info[1] == pytest.approx(1)  # lateral friction
+    assert info[5] == pytest.approx(0)  # restitution
+    assert info[7] == pytest.approx(0.001)  # spinning friction
+
+    cube = collision_objects.Cube(
+        pybullet_client_id=client_id,
+        dynamics={"lateralFriction": 0.5, "restitution": 0.3},
+    )
+    info = pybullet.getDynamicsInfo(
+        cube._object_id, -1, physicsClientId=client_id
+    )
+    assert info[1] == pytest.approx(0.5)
+    assert info[5] == pytest.approx(0.3)
+    assert info[7] == pytest.approx(0.001)
+
+
+def test_cuboid_bulk_create(client_id):
+    positions = [(0, 0, 0.1), (0, 0, 0.2), (0, 0, 0.3)]
+    cubes = collision_objects.Cube.bulk_create(
+        [{"position": pos} for pos in positions], pybullet_client_id=client_id
+    )
+
+    assert len(cubes) == len(positions)
+    for cube, pos in zip(cubes, positions):
+        assert isinstance(cube, collision_objects.Cube)
+        assert cube.get_state()[0] == pytest.approx(pos)
+
+    # the client is set by bulk_create() and must not be part of the specs
+    with pytest.raises(ValueError, match="pybullet_client_id"):
+        collision_objects.Cube.bulk_create(
+            [{"position": (0, 0, 0.1)}, {"pybullet_client_id": client_id}],
+            pybullet_client_id=client_id,
+        )
+
+
+def test_cuboid_pool(client_id):
+    pool = collision_objects.CuboidPool(
+        half_extents=(0.01, 0.01, 0.01),
+        mass=0.1,
+        pybullet_client_id=client_id,
+    )
+
+    cuboid = pool.acquire((0, 0, 0.1))
+    assert len(pool) == 0
+    assert cuboid.get_state()[0] == pytest.approx((0, 0, 0.1))
+
+    pool.release(cuboid)
+    assert len(pool) == 1
+    assert cuboid.get_state()[0] == pytest.approx(pool.PARKING_POSITION)
+    # parked cuboids are static
+    info = pybullet.getDynamicsInfo(
+        cuboid._object_id, -1, physicsClientId=client_id
+    )
+    assert info[0] == 0
+
+    new_cuboid = pool.acquire((0.1, 0, 0.1), (0, 0, 1, 0))
+    assert new_cuboid is cuboid
+    assert len(pool) == 0
+    position, orientation = new_cuboid.get_state()
+    assert position == pytest.approx((0.1, 0, 0.1))
+    assert orientation == pytest.approx((0, 0, 1, 0))
+    info = pybullet.getDynamicsInfo(
+        cuboid._object_id, -1, physicsClientId=client_id
+    )
+    assert info[0] == pytest.approx(0.1)
+
+    # a new cuboid is created if the pool is empty
+    other_cuboid = pool.acquire((0, 0, 0.2))
+    assert other_cuboid is not cuboid
+
+
+def test_cuboid_pool_invalid_release(client_id):
+    pool = collision_objects.CuboidPool(
+        half_extents=(0.01, 0.01, 0.01),
+        mass=0.1,
+        pybullet_client_id=client_id,
+    )
+    cuboid = pool.acquire((0, 0, 0.1))
+    pool.release(cuboid)
+
+    # releasing twice must not put the cuboid into the pool twice
+    with pytest.raises(ValueError):
+        pool.release(cuboid)
+    assert len(pool) == 1
+
+    # cuboids that were not handed out by the pool are rejected, also if they
+    # look the same
+    for half_extents, mass in [
+        ((0.01, 0.01, 0.01), 0.1),
+        ((0.02, 0.01, 0.01), 0.1),
+        ((0.01, 0.01, 0.01), 0.2),
+    ]:
+        other = collision_objects.Cuboid(
+            (0, 0, 0.2),
+            (0, 0, 0, 1),
+            half_extents=half_extents,
+            mass=mass,
+            pybullet_client_id=client_id,
+        )
+        with pytest.raises(ValueError):
+            pool.release(other)
+    assert len(pool) == 1
+
+    first = pool.acquire((0, 0, 0.1))
+    second = pool.acquire((0, 0, 0.2))
+    assert first is cuboid
+    assert second is not first
+
+
+def test_cuboid_pool_parked_no_collisions(client_id):
+    pybullet.setGravity(0, 0, -9.81, physicsClientId=client_id)
+    pool = collision_objects.CuboidPool(
+        half_extents=(0.1, 0.1, 0.1),
+        mass=0.1,
+        pybullet_client_id=client_id,
+    )
+    parked = pool.acquire((1, 0, 0))
+    pool.release(parked)
+
+    # drop a dynamic body onto the parked cuboid
+    drop_position = list(pool.PARKING_POSITION)
+    drop_position[2] += 0.3
+    falling = collision_objects.Cuboid(
+        drop_position,
+        (0, 0, 0, 1),
+        half_extents=(0.05, 0.05, 0.05),
+        mass=0.1,
+        pybullet_client_id=client_id,
+    )
+    for _ in range(200):
+        pybullet.stepSimulation(physicsClientId=client_id)
+        assert not pybullet.getContactPoints(
+            parked._object_id, falling._object_id, physicsClientId=client_id
+        )
+    assert falling.get_state()[0][2] < pool.PARKING_POSITION[2]
+
+    # once acquired again, it collides as usual
+    cuboid = pool.acquire((0, 0, 0.1))
+    assert cuboid is parked
+    falling.set_state((0, 0, 0.22), (0, 0, 0, 1))
+    pybullet.performCollisionDetection(physicsClientId=client_id)
+    assert pybullet.getContactPoints(
+        cuboid._object_id, falling._object_id, physicsClientId=client_id
+    )
+
+
+def test_cuboid_shapes_reused_on_respawn(client_id, capfd):
+    # remove and re-create the cubes like it would be done on every reset of
+    # an environment
+    shape_ids = set()
+    for episode in range(3):
+        cubes = [
+            collision_objects.Cube(
+                position=(0, 0, 0.1 * i),
+                pybullet_client_id=client_id,
+                share_shapes=True,
+            )
+            for i in range(3)
+        ]
+        shape_ids.update(cube.block_id for cube in cubes)
+        for cube in cubes:
+            assert _collision_extents(cube, client_id) == pytest.approx(
+                (0.065, 0.065, 0.065)
+            )
+        del cubes, cube
+
+    assert len(shape_ids) == 1
+    # pyBullet prints errors if removing bodies/shapes fails
+    assert "failed" not in capfd.readouterr().err
+
+
+def test_cube_warm_shape_cache(client_id):
+    key = (client_id, (0.0325,) * 3)
+
+    collision_objects.Cube.warm_shape_cache(pybullet_client_id=client_id)
+    shape_id = collision_objects._box_collision_cache[key]
+
+    cube = collision_objects.Cube(
+        pybullet_client_id=client_id, share_shapes=True
+    )
+    assert cube.block_id == shape_id
+
+
+def test_reset_shape_cache():
+    # shape IDs (and client IDs) are reused after reconnecting, so the cache
+    # must not return shapes of the old simulation
+    client_id = pybullet.connect(pybullet.DIRECT)
+    collision_objects.Cube(pybullet_client_id=client_id, share_shapes=True)
+    pybullet.disconnect(client_id)
+
+    new_client_id = pybullet.connect(pybullet.DIRECT)
+    collision_objects.reset_shape_cache(new_client_id)
+    assert not [
+        k
+        for k in collision_objects._box_collision_cache
+        if k[0] == new_client_id
+    ]
+
+    big_box = collision_objects.Cuboid(
+        (0, 0, -0.5),
+        (0, 0, 0, 1),
+        half_extents=(1, 1, 0.5),
+        mass=0,
+        pybullet_client_id=new_client_id,
+        share_shapes=True,
+    )
+    cube = collision_objects.Cube(
+        pybullet_client_id=new_client_id, share_shapes=True
+    )
+    assert cube.block_id != big_box.block_id
+    assert _collision_extents(cube, new_client_id) == pytest.approx(
+        (0.065, 0.065, 0.065)
+    )
+
+    pybullet.disconnect(new_client_id)
+
+
+def test_default_shapes_after_reconnect():
+    # without shape sharing, cubes must never pick up shapes of a previous
+    # simulation that used the same client ID
+    client_id = pybullet.connect(pybullet.DIRECT)
+    collision_objects.Cube(pybullet_client_id=client_id)
+    pybullet.disconnect(client_id)
+
+    new_client_id = pybullet.connect(pybullet.DIRECT)
+    collision_objects.Cuboid(
+        (0, 0, -0.5),
+        (0, 0, 0, 1),
+        half_extents=(1, 1, 0.5),
+        mass=0,
+        pybullet_client_id=new_client_id,
+    )
+    cube = collision_objects.Cube(pybullet_client_id=new_client_id)
+    assert _collision_extents(cube, new_client_id) == pytest.approx(
+        (0.065, 0.065, 0.065)
+    )
+
+    pybullet.disconnect(new_client_id)
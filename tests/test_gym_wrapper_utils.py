@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import unittest
+
+import numpy as np
+import gym
+
+from trifinger_simulation.gym_wrapper import utils
+
+
+class TestScaleCoefficients(unittest.TestCase):
+    """Test the affine coefficients of scale() and unscale()."""
+
+    def setUp(self):
+        self.space = gym.spaces.Box(
+            low=np.array([-1.5, 0.0, 2.0, -0.3]),
+            high=np.array([1.5, 4.0, 2.5, -0.1]),
+            dtype=np.float64,
+        )
+        self.rng = np.random.default_rng(42)
+
+    def test_scale_coefficients(self):
+        factor, offset = utils.scale_coefficients(self.space)
+
+        for _ in range(10):
+            x = self.rng.uniform(self.space.low, self.space.high)
+            np.testing.assert_allclose(
+                factor * x + offset, utils.scale(x, self.space)
+            )
+
+        # the bounds of the space are mapped to -1 and 1
+        np.testing.assert_allclose(factor * self.space.low + offset, -1)
+        np.testing.assert_allclose(factor * self.space.high + offset, 1)
+
+    def test_unscale_coefficients(self):
+        factor, offset = utils.unscale_coefficients(self.space)
+
+        for _ in range(10):
+            y = self.rng.uniform(-1, 1, size=self.space.shape)
+            np.testing.assert_allclose(
+                factor * y + offset, utils.unscale(y, self.space)
+            )
+
+        np.testing.assert_allclose(factor * -1 + offset, self.space.low)
+        np.testing.assert_allclose(factor * 1 + offset, self.space.high)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+import unittest
+
+import numpy as np
+
+from trifinger_simulation.gym_wrapper import utils
+from trifinger_simulation.gym_wrapper.envs.trifinger_reach import (
+    TriFingerReach,
+)
+
+
+class TestTriFingerReach(unittest.TestCase):
+    """Test the TriFingerReach gym environment."""
+
+    def test_action_smoothing(self):
+        alpha = 0.4
+        env = TriFingerReach(
+            control_rate_s=0.02,
+            finger_type="fingerone",
+            enable_visualization=False,
+            smoothing_params={"is_test": True, "final_alpha": alpha},
+        )
+        env.action_space.seed(0)
+        env.reset()
+
+        # the first action after a reset is not smoothed
+        action = env.action_space.sample()
+        env.step(action)
+        np.testing.assert_allclose(
+            env.smoothed_action,
+            utils.unscale(action, env.unscaled_action_space),
+            rtol=1e-5,
+            atol=1e-6,
+        )
+
+        for _ in range(3):
+            previous = env.smoothed_action.copy()
+            action = env.action_space.sample()
+            env.step(action)
+            expected = alpha * previous + (1 - alpha) * utils.unscale(
+                action, env.unscaled_action_space
+            )
+            np.testing.assert_allclose(
+                env.smoothed_action, expected, rtol=1e-5, atol=1e-6
+            )
+
+    def test_action_dtype(self):
+        # the robot is always commanded with float64 joint positions
+        env = TriFingerReach(
+            control_rate_s=0.02,
+            finger_type="fingerone",
+            enable_visualization=False,
+            smoothing_params={"is_test": True, "final_alpha": 0.4},
+        )
+        env.reset()
+        for _ in range(2):
+            env.step(env.action_space.sample())
+
+            t = env.finger.get_current_timeindex()
+            desired_action = env.finger.get_desired_action(t)
+            applied_action = env.finger.get_applied_action(t)
+            self.assertEqual(desired_action.position.dtype, np.float64)
+            self.assertEqual(applied_action.position.dtype, np.float64)
+            np.testing.assert_allclose(
+                desired_action.position, env.smoothed_action, rtol=1e-6
+            )
+
+    def test_reward_and_observation(self):
+        env = TriFingerReach(
+            control_rate_s=0.02,
+            finger_type="trifingerpro",
+            enable_visualization=False,
+            smoothing_params={"is_test": True, "final_alpha": 0.4},
+        )
+        env.action_space.seed(0)
+        env.reset()
+
+        # record the observations which the environment gets from the robot
+        observations = []
+        get_observation = env.finger.get_observation
+
+        def recording_get_observation(t):
+            observation = get_observation(t)
+            observations.append(observation)
+            return observation
+
+        env.finger.get_observation = recording_get_observation
+
+        slices = env.spaces.key_to_index
+        for _ in range(5):
+            observations.clear()
+            scaled_state, reward, _, _ = env.step(env.action_space.sample())
+            self.assertEqual(len(observations), 1)
+            observation = observations[0]
+            state = utils.unscale(scaled_state, env.unscaled_observation_space)
+
+            np.testing.assert_allclose(
+                state[slices["joint_positions"]],
+                observation.position,
+                rtol=1e-5,
+                atol=1e-5,
+            )
+            np.testing.assert_allclose(
+                state[slices["joint_velocities"]],
+                observation.velocity,
+                rtol=1e-5,
+                atol=1e-5,
+            )
+            np.testing.assert_allclose(
+                state[slices["goal_position"]],
+                np.concatenate(env.goal),
+                rtol=1e-5,
+                atol=1e-5,
+            )
+            np.testing.assert_allclose(
+                state[slices["action_joint_positions"]],
+                env.smoothed_action,
+                rtol=1e-5,
+                atol=1e-5,
+            )
+
+            tip_positions = env.finger.kinematics.forward_kinematics(
+                observation.position
+            )
+            distance = np.linalg.norm(
+                np.concatenate(tip_positions) - np.concatenate(env.goal)
+            )
+            expected_reward = -distance * env.steps_per_control
+            self.assertAlmostEqual(reward, expected_reward, places=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
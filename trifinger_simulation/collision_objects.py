@@ -1,21 +1,196 @@
 """
 Provides classes/functions for loading objects into the simulation environment.
 """
+import contextlib
+import pathlib
 import typing
 
 import pybullet
 
-import trifinger_simulation
-
 
 _SeqFloat = typing.Sequence[float]
 _OptSeqFloat = typing.Optional[_SeqFloat]
 
+# Path to the URDF of ColoredCubeV2.  Note: Resolved relative to this file
+# instead of using trifinger_simulation.get_data_dir() as the latter is not yet
+# defined when this module is imported by the package.
+_CUBE_V2_URDF = str(
+    pathlib.Path(__file__).parent / "data" / "cube_v2" / "cube_v2.urdf"
+)
+
+# Active rendering pauses per pybullet client (see _rendering_paused).  Values
+# are the nesting depth and whether rendering is enabled again when the
+# outermost context is left.
+_rendering_pauses: typing.Dict[int, typing.Tuple[int, bool]] = {}
+
+
+@contextlib.contextmanager
+def _rendering_paused(
+    pybullet_client_id: int = 0, enable_rendering: bool = True
+) -> typing.Iterator[None]:
+    """Disable rendering of the visualisation while the context is active.
+
+    When using the GUI, pyBullet re-renders the scene for each newly created
+    shape/body, which makes loading of objects slow.  Inside this context
+    rendering is disabled, so the scene is only rendered once when the context
+    is left.  Clients that are connected with ``pybullet.DIRECT`` have no
+    visualisation, so nothing is done for them.
+
+    Contexts can be nested, only the outermost context of the given client
+    changes the rendering state.
+
+    Args:
+        pybullet_client_id:  ID of the pybullet client.
+        enable_rendering:  Whether rendering is enabled when the outermost
+            context is left.  pyBullet provides no way to query the current
+            state, so set this to False if rendering was disabled before
+            entering the context and should stay disabled.
+    """
+    if pybullet_client_id in _rendering_pauses:
+        depth, enable_rendering = _rendering_pauses[pybullet_client_id]
+    else:
+        connection_info = pybullet.getConnectionInfo(pybullet_client_id)
+        if (
+            not connection_info["isConnected"]
+            or connection_info["connectionMethod"] == pybullet.DIRECT
+        ):
+            yield
+            return
+
+        depth = 0
+        pybullet.configureDebugVisualizer(
+            pybullet.COV_ENABLE_RENDERING,
+            0,
+            physicsClientId=pybullet_client_id,
+        )
+    _rendering_pauses[pybullet_client_id] = (depth + 1, enable_rendering)
+
+    try:
+        yield
+    finally:
+        if depth > 0:
+            _rendering_pauses[pybullet_client_id] = (depth, enable_rendering)
+        else:
+            del _rendering_pauses[pybullet_client_id]
+            # the client may have been shut down inside the context
+            if enable_rendering and pybullet.isConnected(pybullet_client_id):
+                pybullet.configureDebugVisualizer(
+                    pybullet.COV_ENABLE_RENDERING,
+                    1,
+                    physicsClientId=pybullet_client_id,
+                )
+
+
+def batch_create(
+    pybullet_client_id: int = 0, enable_rendering: bool = True
+) -> typing.ContextManager[None]:
+    """Context for creating many objects at once.
+
+    Rendering of the visualisation is disabled while the context is active, so
+    the scene is only rendered once after all objects are created instead of
+    once per object.  This has no effect when running without visualisation.
+
+    Example:
+
+    .. code-block:: python
+
+        with collision_objects.batch_create(client_id):
+            cubes = [
+                collision_objects.Cube(pos, pybullet_client_id=client_id)
+                for pos in positions
+            ]
+
+    Args:
+        pybullet_client_id:  ID of the pybullet client in which the objects
+            are created.
+        enable_rendering:  Whether rendering is enabled when the context is
+            left.  pyBullet provides no way to query the current state, so
+            set this to False if rendering was disabled before and should
+            stay disabled.
+    """
+    return _rendering_paused(pybullet_client_id, enable_rendering)
+
+
+# Shape IDs of box shapes, shared by all Cuboid instances with the same
+# geometry (and colour) that are created with ``share_shapes=True``.  Keys are
+# (client_id, half_extents) for collision shapes and (client_id, half_extents,
+# color_rgba) for visual shapes.  The shapes are kept until the cache of the
+# client is reset.
+_box_collision_cache: typing.Dict[
+    typing.Tuple[int, typing.Tuple[float, ...]], int
+] = {}
+_box_visual_cache: typing.Dict[
+    typing.Tuple[int, typing.Tuple[float, ...], typing.Tuple[float, ...]], int
+] = {}
+
+
+def reset_shape_cache(pybullet_client_id: int = 0):
+    """Forget all cached shape IDs of the given pybullet client.
+
+    Shape IDs are only valid as long as the simulation they were created in
+    exists.  When using shared shapes (see :class:`Cuboid`), this needs to be
+    called when a client is (re-)connected or the simulation is reset
+    (``pybullet.resetSimulation``), as otherwise stale IDs (which may refer to
+    different shapes in the new simulation) are used.
+    :class:`~trifinger_simulation.SimFinger` calls this automatically when
+    connecting.
+
+    Args:
+        pybullet_client_id:  ID of the pybullet client.
+    """
+    for collision_key in [
+        k for k in _box_collision_cache if k[0] == pybullet_client_id
+    ]:
+        del _box_collision_cache[collision_key]
+
+    for visual_key in [
+        k for k in _box_visual_cache if k[0] == pybullet_client_id
+    ]:
+        del _box_visual_cache[visual_key]
+
+
+def _get_box_collision_shape(
+    half_extents: typing.Tuple[float, ...], pybullet_client_id: int
+) -> int:
+    """Get a (possibly shared) box collision shape."""
+    # Note: pyBullet does not allow removing collision shapes that have been
+    # used by a body (even if the body is removed), so they are kept in the
+    # cache until it is reset.
+    key = (pybullet_client_id, half_extents)
+    if key not in _box_collision_cache:
+        _box_collision_cache[key] = pybullet.createCollisionShape(
+            shapeType=pybullet.GEOM_BOX,
+            halfExtents=half_extents,
+            physicsClientId=pybullet_client_id,
+        )
+
+    return _box_collision_cache[key]
+
+
+def _get_box_visual_shape(
+    half_extents: typing.Tuple[float, ...],
+    color_rgba: typing.Tuple[float, ...],
+    pybullet_client_id: int,
+) -> int:
+    """Get a (possibly shared) box visual shape."""
+    # Note: pyBullet does not provide a way to remove visual shapes, so they
+    # are kept in the cache until it is reset.
+    key = (pybullet_client_id, half_extents, color_rgba)
+    if key not in _box_visual_cache:
+        _box_visual_cache[key] = pybullet.createVisualShape(
+            shapeType=pybullet.GEOM_BOX,
+            halfExtents=half_extents,
+            rgbaColor=color_rgba,
+            physicsClientId=pybullet_client_id,
+        )
+
+    return _box_visual_cache[key]
+
 
 def import_mesh(
     mesh_file_path: str,
     position: _SeqFloat,
-    orientation: _SeqFloat = [0, 0, 0, 1],
+    orientation: _SeqFloat = (0, 0, 0, 1),
     is_concave: bool = False,
     color_rgba: _OptSeqFloat = None,
     pybullet_client_id: int = 0,
@@ -40,30 +215,31 @@ def import_mesh(
     else:
         flags = 0
 
-    object_id = pybullet.createCollisionShape(
-        shapeType=pybullet.GEOM_MESH,
-        fileName=mesh_file_path,
-        flags=flags,
-        physicsClientId=pybullet_client_id,
-    )
-
-    obj = pybullet.createMultiBody(
-        baseCollisionShapeIndex=object_id,
-        baseVisualShapeIndex=-1,
-        basePosition=position,
-        baseOrientation=orientation,
-        physicsClientId=pybullet_client_id,
-    )
-
-    # set colour
-    if color_rgba is not None:
-        pybullet.changeVisualShape(
-            obj,
-            -1,
-            rgbaColor=color_rgba,
+    with _rendering_paused(pybullet_client_id):
+        object_id = pybullet.createCollisionShape(
+            shapeType=pybullet.GEOM_MESH,
+            fileName=mesh_file_path,
+            flags=flags,
+            physicsClientId=pybullet_client_id,
+        )
+
+        obj = pybullet.createMultiBody(
+            baseCollisionShapeIndex=object_id,
+            baseVisualShapeIndex=-1,
+            basePosition=position,
+            baseOrientation=orientation,
             physicsClientId=pybullet_client_id,
         )
 
+        # set colour
+        if color_rgba is not None:
+            pybullet.changeVisualShape(
+                obj,
+                -1,
+                rgbaColor=color_rgba,
+                physicsClientId=pybullet_client_id,
+            )
+
     return obj
 
 
@@ -105,16 +281,16 @@ class BaseCollisionObject:
 
     def get_state(
         self,
-    ) -> typing.Tuple[typing.List[float], typing.List[float]]:
+    ) -> typing.Tuple[typing.Tuple[float, ...], typing.Tuple[float, ...]]:
         """
         Returns:
-            Current position and orientation of the object.
+            Current position and orientation of the object (as returned by
+            pyBullet, i.e. as tuples).
         """
-        position, orientation = pybullet.getBasePositionAndOrientation(
+        return pybullet.getBasePositionAndOrientation(
             self._object_id,
             physicsClientId=self._pybullet_client_id,
         )
-        return list(position), list(orientation)
 
     def __del__(self):
         """Removes the object from the environment."""
@@ -125,7 +301,21 @@ class BaseCollisionObject:
 
 
 class Cuboid(BaseCollisionObject):
-    """A cuboid which can be interacted with."""
+    """A cuboid which can be interacted with.
+
+    If ``share_shapes`` is set, the collision and visual shapes are shared
+    between all cuboids with the same half extents (and colour) in the same
+    pybullet client (see :func:`reset_shape_cache` for the precautions this
+    requires).
+    """
+
+    #: Default dynamics parameters of cuboids.  Keys are the corresponding
+    #: argument names of ``pybullet.changeDynamics``.
+    DEFAULT_DYNAMICS: typing.Dict[str, float] = {
+        "lateralFriction": 1,
+        "spinningFriction": 0.001,
+        "restitution": 0,
+    }
 
     def __init__(
         self,
@@ -135,6 +325,8 @@ class Cuboid(BaseCollisionObject):
         mass: float,
         color_rgba: _OptSeqFloat = None,
         pybullet_client_id: int = 0,
+        dynamics: typing.Optional[typing.Dict[str, float]] = None,
+        share_shapes: bool = False,
     ):
         """
         Args:
@@ -145,70 +337,315 @@ class Cuboid(BaseCollisionObject):
             mass: Mass of the cuboid in kg.  Set to 0 for a static object.
             color_rgba: Optional tuple of RGBA colour.
             pybullet_client_id:  Optional ID of the pybullet client.
+            dynamics: Optional dynamics parameters, overriding the ones in
+                :attr:`DEFAULT_DYNAMICS`.  Keys are the corresponding argument
+                names of ``pybullet.changeDynamics`` (e.g.
+                ``{"lateralFriction": 0.8}``).
+            share_shapes: If true, reuse the collision and visual shapes of
+                previously created cuboids with the same half extents (and
+                colour) instead of creating new ones.  Only use this if the
+                shape cache is reset whenever the simulation is reset or
+                re-connected (see :func:`reset_shape_cache`).
         """
         super().__init__(pybullet_client_id)
 
-        self.block_id = pybullet.createCollisionShape(
-            shapeType=pybullet.GEOM_BOX,
-            halfExtents=half_extents,
+        with _rendering_paused(self._pybullet_client_id):
+            if share_shapes:
+                # normalised version of the half extents for the shape cache
+                half_extents_key = tuple(float(x) for x in half_extents)
+                self.block_id = _get_box_collision_shape(
+                    half_extents_key, self._pybullet_client_id
+                )
+            else:
+                self.block_id = pybullet.createCollisionShape(
+                    shapeType=pybullet.GEOM_BOX,
+                    halfExtents=half_extents,
+                    physicsClientId=self._pybullet_client_id,
+                )
+
+            # only create a visual shape if a colour was specified
+            if color_rgba is None:
+                self.visual_shape_id = -1
+            elif share_shapes:
+                self.visual_shape_id = _get_box_visual_shape(
+                    half_extents_key,
+                    tuple(float(x) for x in color_rgba),
+                    self._pybullet_client_id,
+                )
+            else:
+                self.visual_shape_id = pybullet.createVisualShape(
+                    shapeType=pybullet.GEOM_BOX,
+                    halfExtents=half_extents,
+                    rgbaColor=color_rgba,
+                    physicsClientId=self._pybullet_client_id,
+                )
+
+            self._object_id = pybullet.createMultiBody(
+                baseCollisionShapeIndex=self.block_id,
+                baseVisualShapeIndex=self.visual_shape_id,
+                basePosition=position,
+                baseOrientation=orientation,
+                baseMass=mass,
+                physicsClientId=self._pybullet_client_id,
+            )
+
+        # set dynamics of the block (defaults and custom values in one call)
+        block_dynamics = dict(self.DEFAULT_DYNAMICS)
+        if dynamics:
+            block_dynamics.update(dynamics)
+        pybullet.changeDynamics(
+            bodyUniqueId=self._object_id,
+            linkIndex=-1,
             physicsClientId=self._pybullet_client_id,
+            **block_dynamics,
         )
 
-        # only create a visual shape if a colour was specified
-        if color_rgba is not None:
-            self.visual_shape_id = pybullet.createVisualShape(
-                shapeType=pybullet.GEOM_BOX,
-                halfExtents=half_extents,
-                rgbaColor=color_rgba,
-                physicsClientId=self._pybullet_client_id,
-            )
+    @classmethod
+    def bulk_create(
+        cls,
+        specs: typing.Iterable[typing.Dict[str, typing.Any]],
+        pybullet_client_id: int = 0,
+    ) -> typing.List["Cuboid"]:
+        """Create multiple objects at once.
+
+        Rendering is disabled while the objects are created (see
+        :func:`batch_create`).  The dynamics are still set with one
+        ``changeDynamics`` call per object, as pyBullet does not provide a
+        way to change multiple bodies at once.
+
+        Args:
+            specs: Keyword arguments for the constructor, one dictionary per
+                object.  They must not contain ``pybullet_client_id``, all
+                objects are created in the client given below.
+            pybullet_client_id:  ID of the pybullet client in which the
+                objects are created.
+
+        Returns:
+            List of the created objects (in the same order as ``specs``).
+
+        Raises:
+            ValueError: If one of the specs contains ``pybullet_client_id``.
+        """
+        specs = list(specs)
+        for i, spec in enumerate(specs):
+            if "pybullet_client_id" in spec:
+                raise ValueError(
+                    "specs[{}] contains 'pybullet_client_id'.  Pass it as"
+                    " argument of bulk_create() instead.".format(i)
+                )
+
+        with _rendering_paused(pybullet_client_id):
+            return [
+                cls(**spec, pybullet_client_id=pybullet_client_id)
+                for spec in specs
+            ]
+
+
+class CuboidPool:
+    """Pool of identical cuboids which are reused instead of re-created.
+
+    Use this when cuboids are frequently removed and added again (e.g. on
+    every reset of an environment).  Instead of removing a cuboid from the
+    simulation, it is :meth:`release`-ed to the pool, which parks it out of
+    the way (far away, without collisions and static).  :meth:`acquire`
+    returns such a parked cuboid (or creates a new one if there is none) at
+    the desired pose.
+
+    Example:
+
+    .. code-block:: python
+
+        pool = CuboidPool(half_extents=(0.01, 0.01, 0.01), mass=0.01)
+
+        cube = pool.acquire(position=(0, 0, 0.05))
+        ...
+        pool.release(cube)
+    """
+
+    #: Position at which released cuboids are parked.
+    PARKING_POSITION = (0, 0, -10)
+
+    def __init__(
+        self,
+        half_extents: _SeqFloat,
+        mass: float,
+        color_rgba: _OptSeqFloat = None,
+        pybullet_client_id: int = 0,
+        dynamics: typing.Optional[typing.Dict[str, float]] = None,
+    ):
+        """
+        Args:
+            half_extents: Half-extends of the cuboids in x/y/z-direction.
+            mass: Mass of the cuboids in kg.  Set to 0 for static objects.
+            color_rgba: Optional tuple of RGBA colour.
+            pybullet_client_id:  Optional ID of the pybullet client.
+            dynamics: Optional dynamics parameters, see :class:`Cuboid`.
+        """
+        self._half_extents = half_extents
+        self._mass = mass
+        self._color_rgba = color_rgba
+        self._pybullet_client_id = pybullet_client_id
+        self._dynamics = dynamics
+
+        # collision filter which pyBullet sets for new bodies (needed to
+        # re-enable collisions when a parked cuboid is acquired again)
+        if mass > 0:
+            self._collision_filter_group = 1
+            self._collision_filter_mask = -1
         else:
-            self.visual_shape_id = -1
+            self._collision_filter_group = 2
+            self._collision_filter_mask = -1 ^ 2
 
-        self._object_id = pybullet.createMultiBody(
-            baseCollisionShapeIndex=self.block_id,
-            baseVisualShapeIndex=self.visual_shape_id,
-            basePosition=position,
-            baseOrientation=orientation,
-            baseMass=mass,
+        self._free: typing.List[Cuboid] = []
+        # cuboids that are currently handed out, by object ID
+        self._acquired: typing.Dict[int, Cuboid] = {}
+
+    def acquire(
+        self,
+        position: _SeqFloat,
+        orientation: _SeqFloat = (0, 0, 0, 1),
+    ) -> Cuboid:
+        """Get a cuboid from the pool.
+
+        Args:
+            position: Position at which the cuboid is placed.
+            orientation: Orientation with which the cuboid is placed.
+
+        Returns:
+            A cuboid at the given pose.  Pass it to :meth:`release` once it
+            is not needed anymore.
+        """
+        if not self._free:
+            cuboid = Cuboid(
+                position,
+                orientation,
+                half_extents=self._half_extents,
+                mass=self._mass,
+                color_rgba=self._color_rgba,
+                pybullet_client_id=self._pybullet_client_id,
+                dynamics=self._dynamics,
+            )
+            self._acquired[cuboid._object_id] = cuboid
+            return cuboid
+
+        cuboid = self._free.pop()
+        cuboid.set_state(position, orientation)
+        # changing the mass re-adds the collider with default filter masks,
+        # so it has to be done before setting the collision filter
+        if self._mass > 0:
+            pybullet.changeDynamics(
+                cuboid._object_id,
+                -1,
+                mass=self._mass,
+                physicsClientId=self._pybullet_client_id,
+            )
+        pybullet.setCollisionFilterGroupMask(
+            cuboid._object_id,
+            -1,
+            self._collision_filter_group,
+            self._collision_filter_mask,
             physicsClientId=self._pybullet_client_id,
         )
+        self._acquired[cuboid._object_id] = cuboid
 
-        # set dynamics of the block
-        lateral_friction = 1
-        spinning_friction = 0.001
-        restitution = 0
-        pybullet.changeDynamics(
-            bodyUniqueId=self._object_id,
-            linkIndex=-1,
-            lateralFriction=lateral_friction,
-            spinningFriction=spinning_friction,
-            restitution=restitution,
+        return cuboid
+
+    def release(self, cuboid: Cuboid):
+        """Return a cuboid to the pool.
+
+        The cuboid is parked and must not be used anymore by the caller.
+
+        Args:
+            cuboid: A cuboid that was returned by :meth:`acquire`.
+
+        Raises:
+            ValueError: If the cuboid was not handed out by this pool (this
+                includes cuboids with different geometry or mass) or was
+                already released.
+        """
+        if self._acquired.get(cuboid._object_id) is not cuboid:
+            raise ValueError(
+                "Cuboid (object ID {}) was not acquired from this pool or was"
+                " already released.".format(cuboid._object_id)
+            )
+        del self._acquired[cuboid._object_id]
+
+        cuboid.set_state(self.PARKING_POSITION, (0, 0, 0, 1))
+        pybullet.resetBaseVelocity(
+            cuboid._object_id,
+            (0, 0, 0),
+            (0, 0, 0),
             physicsClientId=self._pybullet_client_id,
         )
+        # make the cuboid static, so it does not fall down while it is parked.
+        # This re-adds the collider with the default filter masks of static
+        # bodies, so collisions can only be disabled afterwards.
+        if self._mass > 0:
+            pybullet.changeDynamics(
+                cuboid._object_id,
+                -1,
+                mass=0,
+                physicsClientId=self._pybullet_client_id,
+            )
+        pybullet.setCollisionFilterGroupMask(
+            cuboid._object_id,
+            -1,
+            0,
+            0,
+            physicsClientId=self._pybullet_client_id,
+        )
+
+        self._free.append(cuboid)
+
+    def __len__(self) -> int:
+        """Number of parked cuboids in the pool."""
+        return len(self._free)
 
 
 class Cube(Cuboid):
     """A cube object."""
 
+    #: Default half width of the cube.
+    DEFAULT_HALF_WIDTH = 0.0325
+
     def __init__(
         self,
-        position: _SeqFloat = [0.15, 0.0, 0.0425],
-        orientation: _SeqFloat = [0, 0, 0, 1],
-        half_width: float = 0.0325,
+        position: _SeqFloat = (0.15, 0.0, 0.0425),
+        orientation: _SeqFloat = (0, 0, 0, 1),
+        half_width: float = DEFAULT_HALF_WIDTH,
         mass: float = 0.08,
         color_rgba: _OptSeqFloat = None,
         pybullet_client_id: int = 0,
+        dynamics: typing.Optional[typing.Dict[str, float]] = None,
+        share_shapes: bool = False,
     ):
         super().__init__(
             position,
             orientation,
-            [half_width] * 3,
+            (half_width, half_width, half_width),
             mass,
             color_rgba=color_rgba,
             pybullet_client_id=pybullet_client_id,
+            dynamics=dynamics,
+            share_shapes=share_shapes,
         )
 
+    @staticmethod
+    def warm_shape_cache(
+        half_width: float = DEFAULT_HALF_WIDTH, pybullet_client_id: int = 0
+    ):
+        """Create the shared collision shape of a cube in advance.
+
+        The shape is used by all cubes of that size that are created with
+        ``share_shapes=True`` and is kept until :func:`reset_shape_cache` is
+        called.
+
+        Args:
+            half_width: Half width of the cube.
+            pybullet_client_id:  Optional ID of the pybullet client.
+        """
+        _get_box_collision_shape((float(half_width),) * 3, pybullet_client_id)
+
 
 #: Alias of Cube
 #:
@@ -234,12 +671,13 @@ class ColoredCubeV2(BaseCollisionObject):
         """
         self._pybullet_client_id = pybullet_client_id
 
-        cube_urdf_file = (
-            trifinger_simulation.get_data_dir() / "cube_v2/cube_v2.urdf"
-        )
-        self._object_id = pybullet.loadURDF(
-            fileName=str(cube_urdf_file),
-            basePosition=position,
-            baseOrientation=orientation,
-            physicsClientId=pybullet_client_id,
-        )
+        with _rendering_paused(pybullet_client_id):
+            self._object_id = pybullet.loadURDF(
+                fileName=_CUBE_V2_URDF,
+                basePosition=position,
+                baseOrientation=orientation,
+                # reuse the graphics shapes (mesh and texture) when more than
+                # one cube is loaded
+                flags=pybullet.URDF_ENABLE_CACHED_GRAPHICS_SHAPES,
+                physicsClientId=pybullet_client_id,
+            )
@@ -1,3 +1,4 @@
+import logging
 import math
 import numpy as np
 import time
@@ -12,6 +13,9 @@ from trifinger_simulation.gym_wrapper import utils
 from trifinger_simulation import visual_objects, sample, finger_types_data
 
 
+_log = logging.getLogger(__name__)
+
+
 class TriFingerReach(gym.Env):
     """
     A gym environment to enable training on either the single or
@@ -27,6 +31,7 @@ class TriFingerReach(gym.Env):
         use_real_robot=False,
         finger_config_suffix="0",
         synchronize=False,
+        verbose=False,
     ):
         """Intializes the constituents of the reaching environment.
 
@@ -66,6 +71,9 @@ class TriFingerReach(gym.Env):
             synchronize (bool): Set this to True if you want to train
                 independently on three fingers in separate processes, but
                 have them synchronized. ([default] False)
+            verbose (bool): Set this to True to print the smoothing
+                coefficient on every reset.  Otherwise it is only logged
+                with level DEBUG. ([default] False)
         """
         #: an instance of a simulated, or a real robot depending on
         #: what is desired.
@@ -86,11 +94,18 @@ class TriFingerReach(gym.Env):
 
         self.num_fingers = finger_types_data.get_number_of_fingers(finger_type)
 
+        # With the real robot, get_observation() is what makes the control
+        # loop wait for the time step to be processed, so it has to be called
+        # for every step.  In simulation, only the first observation of each
+        # env step is needed.
+        self._observe_every_step = use_real_robot
+
         #: the number of times the same action is to be applied to
         #: the robot.
         self.steps_per_control = int(
             round(control_rate_s / self.finger.time_step_s)
         )
+        self._steps_per_control_f = float(self.steps_per_control)
         assert (
             abs(
                 control_rate_s
@@ -134,6 +149,37 @@ class TriFingerReach(gym.Env):
         self.observation_space = self.spaces.get_scaled_observation_space()
         self.action_space = self.spaces.get_scaled_action_space()
 
+        # buffer into which the observation is written in _get_state (to
+        # avoid allocating a new one in every step) and the slices of the
+        # single observation types in it (resolved once here, so no lookups
+        # are needed in every step)
+        self._obs_buf = np.empty(
+            sum(self.observations_sizes), dtype=np.float32
+        )
+        self._obs_slices = [
+            (key, self.spaces.key_to_index[key])
+            for key in self.observations_keys
+        ]
+        self._observe_end_effector_to_goal = (
+            "end_effector_to_goal" in self.spaces.key_to_index
+        )
+
+        # scaling/unscaling are affine maps, so precompute their coefficients
+        # to apply them with a single multiply-add in step().  All per-step
+        # arithmetic is done in float32.
+        obs_scale_coefficients = utils.scale_coefficients(
+            self.unscaled_observation_space
+        )
+        action_unscale_coefficients = utils.unscale_coefficients(
+            self.unscaled_action_space
+        )
+        self._obs_scale_factor, self._obs_scale_offset = (
+            c.astype(np.float32) for c in obs_scale_coefficients
+        )
+        self._action_unscale_factor, self._action_unscale_offset = (
+            c.astype(np.float32) for c in action_unscale_coefficients
+        )
+
         #: a logger to enable logging of observations if desired
         self.logger = DataLogger()
 
@@ -162,7 +208,19 @@ class TriFingerReach(gym.Env):
             )
 
         self.smoothed_action = None
+        # buffer in which the smoothed action is computed (reused for all
+        # steps) and scratch buffer for the computation
+        self._smoothed_action_buf = np.empty(
+            3 * self.num_fingers, dtype=np.float32
+        )
+        self._action_tmp_buf = np.empty_like(self._smoothed_action_buf)
+        # the robot expects the joint positions as float64, so the smoothed
+        # action is copied into this buffer before it is sent
+        self._action_position_buf = np.empty(
+            3 * self.num_fingers, dtype=np.float64
+        )
         self.episode_count = 0
+        self.verbose = verbose
 
         #: a marker to visualize where the target goal position for the episode
         #: is to which the tip link(s) of the robot should reach
@@ -185,34 +243,25 @@ class TriFingerReach(gym.Env):
         self.seed()
         self.reset()
 
-    def _compute_reward(self, observation, goal):
+    def _compute_reward(self):
         """
         The reward function of the environment
 
-        Args:
-            observation (list): the observation at the
-                current step
-            goal (list): the desired goal for the episode
+        The reward is based on the distance of the end-effector positions
+        computed in the last call of _get_state (to avoid running the forward
+        kinematics a second time) to the goal of the episode.
 
         Returns:
             the reward, and the done signal
         """
-        joint_positions = observation[
-            self.spaces.key_to_index["joint_positions"]
-        ]
-
-        end_effector_positions = self.finger.kinematics.forward_kinematics(
-            np.array(joint_positions)
+        distance_to_goal = float(
+            np.linalg.norm(self._last_end_effector_position - self._flat_goal)
         )
 
-        # TODO is matrix norm really always same as vector norm on flattend
-        # matrices?
-        distance_to_goal = utils.compute_distance(end_effector_positions, goal)
-
         reward = -distance_to_goal
         done = False
 
-        return reward * self.steps_per_control, done
+        return reward * self._steps_per_control_f, done
 
     def _get_state(self, observation, action, log_observation=False):
         """
@@ -223,19 +272,26 @@ class TriFingerReach(gym.Env):
                 log the observation
 
         Returns:
-            observation (list): comprising of the observations corresponding
-                to the key values in the observation_keys
+            observation (np.ndarray): comprising of the observations
+                corresponding to the key values in the observation_keys.  Note
+                that the same array is reused (and thus overwritten) on every
+                call.
         """
         tip_positions = self.finger.kinematics.forward_kinematics(
             observation.position
         )
-        end_effector_position = np.concatenate(tip_positions)
+        end_effector_position = np.asarray(
+            tip_positions, dtype=np.float32
+        ).reshape(-1)
+        self._last_end_effector_position = end_effector_position
         joint_positions = observation.position
         joint_velocities = observation.velocity
-        flat_goals = np.concatenate(self.goal)
-        end_effector_to_goal = list(
-            np.subtract(flat_goals, end_effector_position)
-        )
+        flat_goals = self._flat_goal
+        # only compute this if it is actually part of the observation
+        if self._observe_end_effector_to_goal:
+            end_effector_to_goal = flat_goals - end_effector_position
+        else:
+            end_effector_to_goal = None
 
         # populate this observation dict from which you can select which
         # observation types to finally choose depending on the keys
@@ -255,11 +311,10 @@ class TriFingerReach(gym.Env):
 
         # returns only the observations corresponding to the keys that were
         # used for constructing the observation space
-        observation = [
-            v for key in self.observations_keys for v in observation_dict[key]
-        ]
+        for key, obs_slice in self._obs_slices:
+            np.copyto(self._obs_buf[obs_slice], observation_dict[key])
 
-        return observation
+        return self._obs_buf
 
     def step(self, action):
         """
@@ -275,42 +330,51 @@ class TriFingerReach(gym.Env):
         """
         # Unscale the action to the ranges of the action space of the
         # environment, explicitly (as the prediction from the network
-        # lies in the range [-1;1])
-        unscaled_action = utils.unscale(action, self.unscaled_action_space)
-
-        # smooth the action by taking a weighted average with the previous
-        # action, where the weight, ie, the smoothing_alpha is gradually
-        # increased at every episode reset (see the reset method for details)
+        # lies in the range [-1;1]) and smooth it by taking a weighted average
+        # with the previous action, where the weight, ie, the smoothing_alpha
+        # is gradually increased at every episode reset (see the reset method
+        # for details).
+        # Both are done in one pass using the coefficients computed in
+        # update_smoothing().
         if self.smoothed_action is None:
             # start with current position
             # self.smoothed_action = self.finger.observation.position
-            self.smoothed_action = unscaled_action
-
-        self.smoothed_action = (
-            self.smoothing_alpha * self.smoothed_action
-            + (1 - self.smoothing_alpha) * unscaled_action
-        )
+            self.smoothed_action = self._smoothed_action_buf
+            np.multiply(
+                action, self._action_unscale_factor, out=self.smoothed_action
+            )
+            self.smoothed_action += self._action_unscale_offset
+        else:
+            np.multiply(
+                action, self._smoothing_factor, out=self._action_tmp_buf
+            )
+            self.smoothed_action *= self.smoothing_alpha
+            self.smoothed_action += self._action_tmp_buf
+            self.smoothed_action += self._smoothing_offset
 
         # this is the control loop to send the actions for a few timesteps
         # which depends on the actual control rate
-        finger_action = self.finger.Action(position=self.smoothed_action)
-        state = None
-        for _ in range(self.steps_per_control):
+        np.copyto(self._action_position_buf, self.smoothed_action)
+        finger_action = self.finger.Action(position=self._action_position_buf)
+
+        # get observation from first iteration (when action is applied the
+        # first time)
+        t = self.finger.append_desired_action(finger_action)
+        observation = self.finger.get_observation(t)
+        state = self._get_state(observation, self.smoothed_action, True)
+
+        for _ in range(self.steps_per_control - 1):
             t = self.finger.append_desired_action(finger_action)
-            observation = self.finger.get_observation(t)
-            # get observation from first iteration (when action is applied the
-            # first time)
-            if state is None:
-                state = self._get_state(
-                    observation, self.smoothed_action, True
-                )
-            if self.synchronize:
-                self.observation = observation
-        reward, done = self._compute_reward(state, self.goal)
+            if self._observe_every_step:
+                observation = self.finger.get_observation(t)
+
+        if self.synchronize:
+            if not self._observe_every_step:
+                observation = self.finger.get_observation(t)
+            self.observation = observation
+        reward, done = self._compute_reward()
         info = {"is_success": np.float32(done)}
-        scaled_observation = utils.scale(
-            state, self.unscaled_observation_space
-        )
+        scaled_observation = self._scale_observation(state)
         return scaled_observation, reward, done, info
 
     def reset(self):
@@ -337,23 +401,24 @@ class TriFingerReach(gym.Env):
         # updates smoothing parameters
         self.update_smoothing()
         self.episode_count += 1
+        # the smoothed action is re-initialised (in its buffer) with the first
+        # action of the episode
         self.smoothed_action = None
 
         # resets the finger to a random position
-        action = sample.feasible_random_joint_positions_for_reaching(
-            self.finger, self.spaces.action_bounds
-        )
+        action = self._sample_joint_positions()
         observation = self.finger.reset_finger_positions_and_velocities(action)
 
         # generates a random goal for the next episode
-        target_joint_config = np.asarray(
-            sample.feasible_random_joint_positions_for_reaching(
-                self.finger, self.spaces.action_bounds
-            )
-        )
+        target_joint_config = self._sample_joint_positions()
         self.goal = self.finger.kinematics.forward_kinematics(
             target_joint_config
         )
+        # flat version of the goal (needed in every step, so compute it only
+        # once here)
+        self._flat_goal = np.concatenate(self.goal).astype(
+            np.float32, copy=False
+        )
 
         if self.enable_visualization:
             self.goal_marker.set_state(self.goal)
@@ -361,11 +426,38 @@ class TriFingerReach(gym.Env):
         # logs relevant information for replayability
         self.logger.new_episode(target_joint_config, self.goal)
 
-        return utils.scale(
-            self._get_state(observation, action=action),
-            self.unscaled_observation_space,
+        return self._scale_observation(
+            self._get_state(observation, action=action)
         )
 
+    def _sample_joint_positions(self):
+        """
+        Sample a random joint configuration with low risk of collisions (see
+        :func:`sample.feasible_random_joint_positions_for_reaching`)
+
+        Returns:
+            the joint positions as float64 array
+        """
+        return np.asarray(
+            sample.feasible_random_joint_positions_for_reaching(
+                self.finger, self.spaces.action_bounds
+            ),
+            dtype=np.float64,
+        )
+
+    def _scale_observation(self, observation):
+        """
+        Scale the observation to lie between [-1;1]
+        (equivalent to ``utils.scale(observation,
+        self.unscaled_observation_space)``)
+
+        Returns:
+            the scaled observation as a new array
+        """
+        scaled_observation = np.multiply(observation, self._obs_scale_factor)
+        scaled_observation += self._obs_scale_offset
+        return scaled_observation
+
     def update_smoothing(self):
         """
         Update the smoothing coefficient with which the action to be
@@ -377,8 +469,26 @@ class TriFingerReach(gym.Env):
             < self.smoothing_stop_episode
         ):
             self.smoothing_alpha += self.smoothing_increase_step
-        print(
-            "episode: {}, smoothing: {}".format(
-                self.episode_count, self.smoothing_alpha
+
+        # coefficients for unscaling and smoothing the action in one pass:
+        # alpha * prev + (1 - alpha) * unscale(action)
+        #   = alpha * prev + smoothing_factor * action + smoothing_offset
+        self._smoothing_factor = (
+            1 - self.smoothing_alpha
+        ) * self._action_unscale_factor
+        self._smoothing_offset = (
+            1 - self.smoothing_alpha
+        ) * self._action_unscale_offset
+
+        if self.verbose:
+            print(
+                "episode: {}, smoothing: {}".format(
+                    self.episode_count, self.smoothing_alpha
+                )
+            )
+        else:
+            _log.debug(
+                "episode: %d, smoothing: %f",
+                self.episode_count,
+                self.smoothing_alpha,
             )
-        )
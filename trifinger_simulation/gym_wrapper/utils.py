@@ -18,6 +18,26 @@ def unscale(y, space):
     return space.low + (y + 1.0) / 2.0 * (space.high - space.low)
 
 
+def scale_coefficients(space):
+    """
+    Get factor and offset such that ``factor * x + offset`` is equal to
+    ``scale(x, space)``
+    """
+    factor = 2.0 / (space.high - space.low)
+    offset = -space.low * factor - 1.0
+    return factor, offset
+
+
+def unscale_coefficients(space):
+    """
+    Get factor and offset such that ``factor * y + offset`` is equal to
+    ``unscale(y, space)``
+    """
+    factor = (space.high - space.low) / 2.0
+    offset = space.low + factor
+    return factor, offset
+
+
 def compute_distance(a, b):
     """
     Returns the Euclidean distance between two
@@ -730,6 +730,10 @@ class SimFinger:
         else:
             pybullet_client_id = pybullet.connect(pybullet.DIRECT)
 
+        # the client ID may have been used by a previous connection, so make
+        # sure no shapes of that old simulation are reused
+        collision_objects.reset_shape_cache(pybullet_client_id)
+
         return pybullet_client_id
 
     def __set_urdf_path(self):
@@ -213,15 +213,16 @@ class TriFingerPlatform:
             die_mass = 0.012
             # use a random goal for initial positions
             initial_positions = rearrange_dice.sample_goal()
-            self.dice = [
-                collision_objects.Cube(
-                    position=pos,
-                    half_width=rearrange_dice.DIE_WIDTH / 2,
-                    mass=die_mass,
-                    color_rgba=int_to_rgba(0x0A7DCF),
-                )
-                for pos in initial_positions
-            ]
+            with collision_objects.batch_create():
+                self.dice = [
+                    collision_objects.Cube(
+                        position=pos,
+                        half_width=rearrange_dice.DIE_WIDTH / 2,
+                        mass=die_mass,
+                        color_rgba=int_to_rgba(0x0A7DCF),
+                    )
+                    for pos in initial_positions
+                ]
 
         self.tricamera = camera.TriFingerCameras(
             pybullet_client_id=self.simfinger._pybullet_client_id